@@ -1,12 +1,12 @@
 import webview
 import os
 import sys
-from engine import ExpertSystem
+from engine import ExpertSystem, DEFAULT_KB_PATH
 
 class Api:
     def __init__(self):
         # Initialize the expert system
-        self.system = ExpertSystem('knowledge_base_15_rules_forward_chaining_15.csv')
+        self.system = ExpertSystem(DEFAULT_KB_PATH)
 
     def get_symptoms(self):
         """Expose observable symptoms to the UI."""
@@ -1,8 +1,53 @@
+import hashlib
 import json
-import csv
 import os
+import pickle
+import sys
+import tempfile
+
+# Knowledge base shared by the desktop and web UIs
+DEFAULT_KB_PATH = 'knowledge_base_15_rules_forward_chaining_15.csv'
+
+# Parsed rules and indexes are cached in a per-user directory, never next to
+# the knowledge base: the cache is a pickle, and loading one planted in the
+# working directory would run arbitrary code.
+# Bump the version whenever build_indexes changes what it stores.
+INDEX_CACHE_DIR = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+    or os.path.join(os.path.expanduser('~'), '.cache'),
+    'medical-symptom-checker')
+INDEX_CACHE_SUFFIX = '.idx.pkl'
+INDEX_CACHE_VERSION = 6
+
+# Smallest rule base handed to the optional numba kernel. Below this the
+# generated match() is faster per call, and numba only adds import and
+# JIT-cache load time.
+KERNEL_MIN_RULES = 300
+
+# HTML indentation of backward-verification trace lines, by depth
+TRACE_INDENTS = ["&nbsp;" * (depth * 4) for depth in range(64)]
+
+def index_cache_path(file_path):
+    """Cache file for a knowledge base, keyed by its absolute path."""
+    abs_path = os.path.abspath(file_path)
+    digest = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(INDEX_CACHE_DIR, f"{os.path.basename(abs_path)}-{digest}{INDEX_CACHE_SUFFIX}")
+
+def _is_private_file(f):
+    """True unless another user owns f or could have written to it (POSIX only)."""
+    if not hasattr(os, 'getuid'):
+        return True
+    stat = os.fstat(f.fileno())
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+def trace_indent(depth):
+    if depth < len(TRACE_INDENTS):
+        return TRACE_INDENTS[depth]
+    return "&nbsp;" * (depth * 4)
 
 class Rule:
+    __slots__ = ('rule_id', 'conditions', 'conclusion', 'precautions')
+
     def __init__(self, rule_id, conditions, conclusion, precautions):
         self.rule_id = rule_id
         self.conditions = conditions  # List of strings
@@ -12,13 +57,136 @@ class Rule:
     def __repr__(self):
         return f"Rule({self.rule_id}: {self.conditions} -> {self.conclusion})"
 
+class _GoalFrame:
+    """A goal being proven by backward_verification's explicit stack."""
+    __slots__ = ('goal', 'depth', 'candidate_rules', 'rule_pos', 'condition_pos',
+                 'first_line', 'facts_at_open', 'loop_cuts_at_open')
+
+    def __init__(self, goal, depth, candidate_rules, first_line, facts_at_open, loop_cuts_at_open):
+        self.goal = goal
+        self.depth = depth
+        self.candidate_rules = candidate_rules
+        self.rule_pos = 0  # Index of the candidate rule being tried
+        self.condition_pos = 0  # Index of its next condition to prove
+        self.first_line = first_line  # Trace position where this goal started
+        self.facts_at_open = facts_at_open  # len(known_facts) when opened
+        self.loop_cuts_at_open = loop_cuts_at_open
+
 class ExpertSystem:
     def __init__(self, file_path):
         self.rules = []
+        self.terms = []
+        self.term_id = {}
+        self.rule_masks = []
+        self.rule_conclusion_ids = []
+        self.match_source = ''
+        self.by_conclusion = {}
+        self.observable_symptoms_sorted = []
+        self.conclusions_sorted = []
         try:
-            self.load_rules(file_path)
+            self.load_or_build(file_path)
         except Exception as e:
             print(f"Error loading rules: {e}")
+            self.build_indexes()
+        # Functions and arrays are kept out of the on-disk cache, which must
+        # stay picklable and load without numpy. match() is compiled on first
+        # use: large rule bases may never need it once the kernel is set up.
+        self._match = None
+        self._fc_kernel = None
+        self.kernel_rule_masks = None
+        self.kernel_conclusion_lanes = None
+        self.kernel_conclusion_bits = None
+        if len(self.rules) >= KERNEL_MIN_RULES:
+            self._init_kernel()
+
+    def _compile_match(self):
+        namespace = {}
+        exec(compile(self.match_source, '<rules>', 'exec'), namespace)
+        self._match = namespace['match']
+        return self._match
+
+    def _init_kernel(self):
+        """Set up the numba kernel when it is installed, one uint64 lane per 64 terms."""
+        try:
+            import numpy as np
+            from engine_numba import fc_kernel, split_lanes, join_lanes, LANE_BITS
+        except ImportError:
+            # numba is optional: forward chaining keeps using match()
+            return
+        self._kernel_lanes = max(1, -(-len(self.terms) // LANE_BITS))
+        self._split_lanes = split_lanes
+        self._join_lanes = join_lanes
+        self.kernel_rule_masks = np.array(
+            [split_lanes(mask, self._kernel_lanes) for mask in self.rule_masks],
+            dtype=np.uint64).reshape(len(self.rule_masks), self._kernel_lanes)
+        self.kernel_conclusion_lanes = np.array(
+            [c // LANE_BITS for c in self.rule_conclusion_ids], dtype=np.int64)
+        self.kernel_conclusion_bits = np.array(
+            [1 << (c % LANE_BITS) for c in self.rule_conclusion_ids], dtype=np.uint64)
+        self._fc_kernel = fc_kernel
+
+    def load_or_build(self, file_path):
+        """
+        Restore rules and indexes from the on-disk cache when it matches the
+        knowledge base's mtime and size; otherwise parse, index and rewrite it.
+        """
+        cache_path = index_cache_path(file_path)
+        stat = os.stat(file_path)
+        signature = (INDEX_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+
+        try:
+            with open(cache_path, 'rb') as f:
+                if not _is_private_file(f):
+                    raise PermissionError(f"Ignoring rule cache not private to this user: {cache_path}")
+                cached_signature, state = pickle.load(f)
+            if cached_signature == signature:
+                self.__dict__.update(state)
+                self._intern_terms()
+                return
+        except Exception:
+            # Missing, stale-format, corrupt or foreign cache: rebuild it below,
+            # dropping anything a half-applied cache state left behind
+            self.rules = []
+
+        self.load_rules(file_path)
+        self.build_indexes()
+
+        tmp_path = None
+        try:
+            cache_dir = os.path.dirname(cache_path)
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=cache_dir, delete=False) as f:
+                tmp_path = f.name
+                pickle.dump((signature, vars(self)), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+            tmp_path = None
+        except Exception as e:
+            # Unwritable cache directory or unpicklable state: keep working
+            # without the cache
+            print(f"Could not write rule cache: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _intern_terms(self):
+        """
+        Re-intern the strings restored from the cache. Unpickling keeps one
+        object per distinct string but does not intern it, which _load_csv
+        relies on for fast dict/set lookups.
+        """
+        intern = sys.intern
+        for rule in self.rules:
+            rule.rule_id = intern(rule.rule_id)
+            rule.conditions = [intern(c) for c in rule.conditions]
+            rule.conclusion = intern(rule.conclusion)
+        self.terms = [intern(t) for t in self.terms]
+        self.term_id = {t: i for i, t in enumerate(self.terms)}
+        self.by_conclusion = {intern(c): rules for c, rules in self.by_conclusion.items()}
+        self.observable_symptoms_sorted = [intern(s) for s in self.observable_symptoms_sorted]
+        self.conclusions_sorted = [intern(c) for c in self.conclusions_sorted]
 
     def load_rules(self, file_path):
         ext = os.path.splitext(file_path)[1].lower()
@@ -39,61 +207,140 @@ class ExpertSystem:
                 ))
 
     def _load_csv(self, csv_path):
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Handle potential whitespace in CSV keys/values
-                row = {k.strip(): v.strip() for k, v in row.items()}
-                
-                if not row['conditions']:
-                    continue
-                    
-                conditions = [c.strip() for c in row['conditions'].split(';')]
-                self.rules.append(Rule(
-                    row['rule_id'],
-                    conditions,
-                    row['conclusion'],
-                    row['precautions']
-                ))
+        # Imported here rather than at module level: pandas takes longer to
+        # import than the whole engine, and a cache hit never needs it
+        import pandas as pd
 
-    def get_observable_symptoms(self):
-        """Returns symptoms that are not conclusions of other rules (leaf inputs)."""
-        all_conclusions = set(r.conclusion for r in self.rules)
-        all_conditions = set()
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        # Handle potential whitespace in CSV keys/values
+        df.columns = df.columns.str.strip()
+        for col in ('rule_id', 'conditions', 'conclusion', 'precautions'):
+            df[col] = df[col].str.strip()
+
+        df = df[df['conditions'] != '']
+        # Split every row in one vectorized pass before building the rules.
+        # Ids, conditions and conclusions are interned: they are used as
+        # dict/set keys throughout the engine and repeat across rules.
+        split_conditions = df['conditions'].str.split(';')
+        for rule_id, conditions, conclusion, precautions in zip(
+                df['rule_id'], split_conditions, df['conclusion'], df['precautions']):
+            conditions = [sys.intern(c) for c in map(str.strip, conditions) if c]
+            # A row like ' ; ' has no condition left once blanks are dropped;
+            # kept, it would fire on every diagnosis
+            if not conditions:
+                continue
+            self.rules.append(Rule(sys.intern(rule_id), conditions, sys.intern(conclusion), precautions))
+
+    def build_indexes(self):
+        """
+        Encode every condition/conclusion as a bit and every rule as a mask,
+        and generate the source of a specialized match(facts) function.
+        Term ids are handed out rarest condition first.
+        """
+        condition_df = {}
         for rule in self.rules:
+            for c in set(rule.conditions):
+                condition_df[c] = condition_df.get(c, 0) + 1
+
+        self.terms = sorted(condition_df, key=condition_df.__getitem__)
+        conclusions = dict.fromkeys(r.conclusion for r in self.rules)
+        self.terms += [c for c in conclusions if c not in condition_df]
+        self.term_id = {t: i for i, t in enumerate(self.terms)}
+
+        # Leaf inputs are conditions that no rule concludes
+        self.observable_symptoms_sorted = sorted(c for c in condition_df if c not in conclusions)
+        self.conclusions_sorted = sorted(conclusions)
+
+        self.rule_masks = []
+        self.rule_conclusion_ids = []
+        self.by_conclusion = {}
+        for i, rule in enumerate(self.rules):
+            self.by_conclusion.setdefault(rule.conclusion, []).append(rule)
+            mask = 0
             for c in rule.conditions:
-                all_conditions.add(c)
-        
-        observable = all_conditions - all_conclusions
-        return sorted(list(observable))
+                mask |= 1 << self.term_id[c]
+            self.rule_masks.append(mask)
+            self.rule_conclusion_ids.append(self.term_id[rule.conclusion])
+
+        self.match_source = self._generate_match_source()
+
+    def _generate_match_source(self):
+        """
+        Unroll the forward-chaining fixed point into straight-line Python: one
+        `if` per rule testing its conditions as string literals, rarest first
+        so the `and` chain bails out as early as possible. match(facts, stop)
+        adds derived conclusions to facts and returns the fired rule indices,
+        returning early as soon as stop(facts) is true.
+        """
+        lines = ["def match(facts, stop=None):", "    fired = []"]
+        if self.rules:
+            lines.append("    " + " = ".join(f"f{i}" for i in range(len(self.rules))) + " = False")
+        lines += ["    changed = True", "    while changed:", "        changed = False"]
+        for i, rule in enumerate(self.rules):
+            conditions = sorted(set(rule.conditions), key=self.term_id.__getitem__)
+            tests = "".join(f" and {c!r} in facts" for c in conditions)
+            lines += [
+                f"        if not f{i}{tests}:",
+                f"            f{i} = True",
+                f"            fired.append({i})",
+                f"            if {rule.conclusion!r} not in facts:",
+                f"                facts.add({rule.conclusion!r})",
+                "                changed = True",
+                "                if stop is not None and stop(facts):",
+                "                    return fired",
+            ]
+        lines.append("    return fired")
+        return "\n".join(lines) + "\n"
+
+    def get_observable_symptoms(self):
+        """Returns symptoms that are not conclusions of other rules (leaf inputs)."""
+        return list(self.observable_symptoms_sorted)
 
     def get_all_conclusions(self):
-        return sorted(list(set(r.conclusion for r in self.rules)))
+        return list(self.conclusions_sorted)
 
-    def forward_chaining(self, selected_symptoms):
+    def forward_chaining(self, selected_symptoms, stop=None):
         """
         Derive all possible diseases from selected symptoms.
+        stop: optional predicate on the known facts; chaining ends early once
+        it returns True (e.g. when every disease of interest is inferred).
+        Rules are reported in firing order: repeated passes over the rule
+        list, each pass in file order, until a pass derives nothing new.
         Returns: matching_rules (list), known_facts (set)
         """
+        # The compiled kernel cannot call back into Python for stop
+        if self._fc_kernel is not None and stop is None:
+            return self._forward_chaining_kernel(selected_symptoms)
+
+        match = self._match
+        if match is None:
+            match = self._compile_match()
         known_facts = set(selected_symptoms)
-        fired_rules = []
-        
-        while True:
-            new_rule_fired = False
-            for rule in self.rules:
-                if rule in fired_rules:
-                    continue
-                
-                # Check if all conditions are met
-                if all(c in known_facts for c in rule.conditions):
-                    if rule.conclusion not in known_facts:
-                        known_facts.add(rule.conclusion)
-                        new_rule_fired = True
-                    fired_rules.append(rule)
-            
-            if not new_rule_fired:
-                break
-                
+        fired_rules = [self.rules[i] for i in match(known_facts, stop)]
+        return fired_rules, known_facts
+
+    def _forward_chaining_kernel(self, selected_symptoms):
+        """forward_chaining through the numba kernel."""
+        import numpy as np
+
+        facts_mask = 0
+        unknown_facts = set()
+        for sym in selected_symptoms:
+            if sym in self.term_id:
+                facts_mask |= 1 << self.term_id[sym]
+            else:
+                unknown_facts.add(sym)
+
+        facts = np.array(self._split_lanes(facts_mask, self._kernel_lanes), dtype=np.uint64)
+        fired_out = np.empty(len(self.rules), dtype=np.int32)
+        n_fired = self._fc_kernel(
+            self.kernel_rule_masks, self.kernel_conclusion_lanes, self.kernel_conclusion_bits,
+            facts, fired_out)
+        facts_mask = self._join_lanes(facts.tolist())
+
+        fired_rules = [self.rules[i] for i in fired_out[:n_fired]]
+        known_facts = {t for i, t in enumerate(self.terms) if facts_mask >> i & 1}
+        known_facts |= unknown_facts
         return fired_rules, known_facts
 
     def backward_verification(self, target_disease, user_symptoms):
@@ -102,37 +349,82 @@ class ExpertSystem:
         Returns: (is_confirmed, trace_log)
         """
         known_facts = set(user_symptoms)
-        trace_log = []
-        
-        def check_goal(goal, depth=0):
-            indent = "&nbsp;" * (depth * 4)
-            
+        # Sub-goals that already failed during this call, with their trace
+        # relative to the goal. Established goals need no entry: they are
+        # added to known_facts. A failure is only memoized when its subtree
+        # established nothing and hit no loop, otherwise a replay would differ
+        # from a re-check.
+        failed_goals = {}
+        # Goals on the current ancestor chain; a sub-goal that reappears in
+        # its own chain is cut off instead of being expanded again
+        open_goals = set()
+        loop_cuts = 0
+        # Single output buffer of (depth, html) lines, in traversal order
+        lines = []
+        # Explicit goal stack of _GoalFrame instead of recursion
+        stack = []
+
+        def open_goal(goal, depth):
+            """Settle goal immediately if possible, else push a frame and return None."""
+            nonlocal loop_cuts
             if goal in known_facts:
-                trace_log.append(f"{indent}<span style='color:green'>[OK] Fact '{goal}' detected.</span>")
+                lines.append((depth, f"<span style='color:green'>[OK] Fact '{goal}' detected.</span>"))
                 return True
 
-            candidate_rules = [r for r in self.rules if r.conclusion == goal]
+            if goal in failed_goals:
+                lines.extend((depth + d, text) for d, text in failed_goals[goal])
+                return False
+
+            if goal in open_goals:
+                lines.append((depth, f"<span style='color:gray'>[LOOP] '{goal}' depends on itself; skipped.</span>"))
+                loop_cuts += 1
+                return False
+
+            candidate_rules = self.by_conclusion.get(goal)
             
             if not candidate_rules:
-                trace_log.append(f"{indent}<span style='color:red'>[MISSING] '{goal}' not found in symptoms.</span>")
+                missing = f"<span style='color:red'>[MISSING] '{goal}' not found in symptoms.</span>"
+                lines.append((depth, missing))
+                failed_goals[goal] = ((0, missing),)
                 return False
-            
-            for rule in candidate_rules:
-                trace_log.append(f"{indent}Checking Rule {rule.rule_id} for '{goal}'...")
-                
-                all_conditions_met = True
-                for condition in rule.conditions:
-                    if not check_goal(condition, depth + 1):
-                        all_conditions_met = False
-                        break
-                
-                if all_conditions_met:
-                    trace_log.append(f"{indent}<span style='color:blue'>[SUCCESS] Rule {rule.rule_id} fired. '{goal}' confirmed.</span>")
-                    known_facts.add(goal) 
-                    return True
-            
-            trace_log.append(f"{indent}<span style='color:orange'>[FAIL] Could not establish '{goal}'.</span>")
-            return False
 
-        result = check_goal(target_disease)
-        return result, trace_log
\ No newline at end of file
+            stack.append(_GoalFrame(goal, depth, candidate_rules, len(lines), len(known_facts), loop_cuts))
+            open_goals.add(goal)
+            lines.append((depth, f"Checking Rule {candidate_rules[0].rule_id} for '{goal}'..."))
+            return None
+
+        # Outcome of the goal that was just settled; None means the frame on
+        # top of the stack was just opened and has not tried a condition yet
+        result = open_goal(target_disease, 0)
+        while stack:
+            frame = stack[-1]
+            goal, depth, candidate_rules = frame.goal, frame.depth, frame.candidate_rules
+
+            if result is False:
+                # A condition failed: move on to the next candidate rule
+                frame.rule_pos += 1
+                frame.condition_pos = 0
+                if frame.rule_pos == len(candidate_rules):
+                    lines.append((depth, f"<span style='color:orange'>[FAIL] Could not establish '{goal}'.</span>"))
+                    if len(known_facts) == frame.facts_at_open and loop_cuts == frame.loop_cuts_at_open:
+                        failed_goals[goal] = tuple((d - depth, text) for d, text in lines[frame.first_line:])
+                    stack.pop()
+                    open_goals.discard(goal)
+                    continue
+                lines.append((depth, f"Checking Rule {candidate_rules[frame.rule_pos].rule_id} for '{goal}'..."))
+            elif result is True:
+                frame.condition_pos += 1
+
+            rule = candidate_rules[frame.rule_pos]
+            if frame.condition_pos == len(rule.conditions):
+                lines.append((depth, f"<span style='color:blue'>[SUCCESS] Rule {rule.rule_id} fired. '{goal}' confirmed.</span>"))
+                known_facts.add(goal)
+                stack.pop()
+                open_goals.discard(goal)
+                result = True
+                continue
+
+            result = open_goal(rule.conditions[frame.condition_pos], depth + 1)
+
+        trace_log = [trace_indent(depth) + text for depth, text in lines]
+        return result, trace_log
@@ -0,0 +1,61 @@
+"""
+Numba-compiled forward-chaining kernel.
+
+Works on the bitmask encoding built by ExpertSystem.build_indexes, split
+into 64-bit lanes: each rule is a row of uint64 masks of its condition ids
+plus the lane and bit of its conclusion, so the whole fixed point is integer
+AND/OR over a few arrays whatever the number of terms. engine.py uses its
+generated match() function instead for small rule bases, or when numba is
+not installed.
+"""
+import numpy as np
+from numba import njit
+
+LANE_BITS = 64
+
+
+def split_lanes(mask, n_lanes):
+    """Split an int bitmask into n_lanes uint64 values, lowest bits first."""
+    return [(mask >> (LANE_BITS * lane)) & 0xFFFFFFFFFFFFFFFF for lane in range(n_lanes)]
+
+
+def join_lanes(lanes):
+    """Inverse of split_lanes: combine uint64 lane values into one int bitmask."""
+    mask = 0
+    for lane, bits in enumerate(lanes):
+        mask |= int(bits) << (LANE_BITS * lane)
+    return mask
+
+
+@njit(cache=True)
+def fc_kernel(rule_masks, conclusion_lanes, conclusion_bits, facts, fired_out):
+    """
+    Fire rules until no new fact is derived.
+    Sets derived conclusions in facts (one uint64 per lane) in place and
+    writes the indices of fired rules to fired_out in firing order.
+    Returns: number of fired rules
+    """
+    n_rules, n_lanes = rule_masks.shape
+    fired = np.zeros(n_rules, dtype=np.bool_)
+    n_fired = 0
+    changed = True
+    while changed:
+        changed = False
+        for i in range(n_rules):
+            if fired[i]:
+                continue
+            matched = True
+            for lane in range(n_lanes):
+                mask = rule_masks[i, lane]
+                if facts[lane] & mask != mask:
+                    matched = False
+                    break
+            if matched:
+                fired[i] = True
+                fired_out[n_fired] = i
+                n_fired += 1
+                lane = conclusion_lanes[i]
+                if facts[lane] & conclusion_bits[i] == 0:
+                    facts[lane] |= conclusion_bits[i]
+                    changed = True
+    return n_fired
@@ -0,0 +1,175 @@
+"""
+Headless expert-system engine served over stdin/stdout JSON lines.
+
+The chaining loops in engine.py are pure Python, which PyPy's JIT runs much
+faster than CPython. The Qt UI has to stay on CPython, so it talks to this
+module running under `pypy3 engine_server.py <knowledge_base.csv>` instead of
+calling the engine in-process. When PyPy is not available, connect_engine()
+simply returns a regular in-process ExpertSystem.
+
+Protocol: one JSON object per line in each direction.
+    request:  {"method": "forward_chaining", "args": [["cough", "chills"]]}
+    response: {"result": ...} or {"error": "message"}
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from engine import ExpertSystem, Rule, DEFAULT_KB_PATH
+
+PYPY_EXECUTABLE = 'pypy3'
+
+
+def rule_to_dict(rule):
+    return {
+        'rule_id': rule.rule_id,
+        'conditions': list(rule.conditions),
+        'conclusion': rule.conclusion,
+        'precautions': rule.precautions
+    }
+
+
+def handle_request(system, method, args):
+    if method == 'get_observable_symptoms':
+        return system.get_observable_symptoms()
+    if method == 'get_all_conclusions':
+        return system.get_all_conclusions()
+    if method == 'forward_chaining':
+        fired_rules, known_facts = system.forward_chaining(*args)
+        return [[rule_to_dict(r) for r in fired_rules], sorted(known_facts)]
+    if method == 'backward_verification':
+        return list(system.backward_verification(*args))
+    raise ValueError(f"Unknown method: {method}")
+
+
+def serve(file_path, stdin, stdout):
+    """Answer engine requests read from stdin until it is closed."""
+    system = ExpertSystem(file_path)
+    # ExpertSystem reports load errors (e.g. no pandas under PyPy) and carries
+    # on empty; exit instead so connect_engine falls back to the in-process engine
+    if not system.rules:
+        print(f"Engine server loaded no rules from {file_path}; exiting.", file=sys.stderr)
+        sys.exit(1)
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            response = {'result': handle_request(system, request['method'], request.get('args', []))}
+        except Exception as e:
+            response = {'error': str(e)}
+        stdout.write(json.dumps(response) + '\n')
+        stdout.flush()
+
+
+class EngineServerExited(RuntimeError):
+    """The engine_server process stopped answering."""
+
+
+class RemoteExpertSystem:
+    """
+    Stand-in for ExpertSystem that forwards every call to an engine_server
+    process. Calls run on an in-process ExpertSystem instead once that
+    process dies, and forward_chaining calls with a stop predicate always do,
+    since a callable cannot be sent to another process.
+    """
+
+    def __init__(self, file_path, executable=PYPY_EXECUTABLE):
+        self._file_path = file_path
+        # In-process engine, created on first need (see _local_engine)
+        self._local = None
+        self._server_lost = False
+        self._proc = subprocess.Popen(
+            [executable, os.path.abspath(__file__), os.path.abspath(file_path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+
+    def _request(self, method, *args):
+        try:
+            self._proc.stdin.write(json.dumps({'method': method, 'args': args}) + '\n')
+            self._proc.stdin.flush()
+        except OSError as e:
+            raise EngineServerExited(f"Engine server is not running: {e}")
+
+        line = self._proc.stdout.readline()
+        if not line:
+            raise EngineServerExited("Engine server exited unexpectedly.")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def _local_engine(self):
+        if self._local is None:
+            self._local = ExpertSystem(self._file_path)
+        return self._local
+
+    def _call(self, method, *args):
+        if not self._server_lost:
+            try:
+                return self._request(method, *args)
+            except EngineServerExited as e:
+                print(f"PyPy engine lost, continuing in-process: {e}")
+                self._proc.kill()
+                self._server_lost = True
+        # Same JSON-shaped result the server would have sent
+        return handle_request(self._local_engine(), method, args)
+
+    def get_observable_symptoms(self):
+        return self._call('get_observable_symptoms')
+
+    def get_all_conclusions(self):
+        return self._call('get_all_conclusions')
+
+    def forward_chaining(self, selected_symptoms, stop=None):
+        if stop is not None:
+            return self._local_engine().forward_chaining(selected_symptoms, stop)
+        fired_rules, known_facts = self._call('forward_chaining', list(selected_symptoms))
+        return [Rule(**r) for r in fired_rules], set(known_facts)
+
+    def backward_verification(self, target_disease, user_symptoms):
+        success, trace = self._call('backward_verification', target_disease, list(user_symptoms))
+        return success, trace
+
+    def close(self):
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            self._proc.wait()
+
+
+def connect_engine(file_path=DEFAULT_KB_PATH):
+    """
+    Returns an engine running under PyPy when it is installed, otherwise an
+    in-process ExpertSystem. Both expose the same methods to the UI.
+    """
+    executable = shutil.which(PYPY_EXECUTABLE)
+    # A frozen (PyInstaller) build has no engine_server.py on disk to launch
+    if executable is None or getattr(sys, 'frozen', False):
+        return ExpertSystem(file_path)
+
+    remote = None
+    try:
+        remote = RemoteExpertSystem(file_path, executable)
+        # Round-trip once so a server that failed to start or to load the
+        # rules is caught here rather than silently replaced by the fallback
+        if not remote._request('get_all_conclusions'):
+            raise RuntimeError("Engine server has no rules loaded.")
+        return remote
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"PyPy engine unavailable, running in-process: {e}")
+        if remote is not None:
+            remote._proc.kill()
+        return ExpertSystem(file_path)
+
+
+if __name__ == '__main__':
+    # Keep stdout for the protocol; engine diagnostics go to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    serve(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_KB_PATH, sys.stdin, protocol_out)
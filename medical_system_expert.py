@@ -1,21 +1,95 @@
 import sys
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QGroupBox, QCheckBox, QPushButton, QTextEdit,
-                               QComboBox,
-                             QScrollArea, QFrame, QSplitter, QMessageBox, QGridLayout, 
-                             QGraphicsOpacityEffect)
-from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve
-from PyQt6.QtGui import QPalette, QColor
-from engine import ExpertSystem
+from functools import cached_property
+from qt import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                QLabel, QGroupBox, QCheckBox, QPushButton, QTextEdit,
+                QComboBox,
+                QScrollArea, QFrame, QSplitter, QMessageBox, QGridLayout,
+                QButtonGroup,
+                Qt, QVariantAnimation, QEasingCurve, QTimer, QSignalBlocker,
+                QStringListModel, QPalette, QColor)
+# engine.py only needs the standard library at import time; pandas, numba
+# and engine_server are loaded when the system property starts the engine
+from engine import DEFAULT_KB_PATH
 
-class ModernButton(QPushButton):
-    def __init__(self, text, color="#00bcd4", parent=None):
-        super().__init__(text, parent)
-        self.set_color(color)
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
+# Report fragments for run_diagnosis
+_NO_RESULT_HTML = """
+            <div style="background-color: #ffebee; border: 1px solid #ef9a9a; padding: 15px; border-radius: 8px;">
+                <h3 style="color: #c62828; margin-top: 0;">❌ No Diagnosis Found</h3>
+                <p>No specific disease matched your symptoms based on our current knowledge base.</p>
+                <p><b>Advice:</b> Please consult a real doctor for a professional assessment.</p>
+            </div>
+            """
 
-    def set_color(self, color):
-        self.setStyleSheet(f"""
+_TRACE_HEADING_HTML = "<h3 style='color: #7f8c8d; border-bottom: 1px solid #ccc; padding-bottom:5px;'>Diagnostic Trace</h3>"
+
+_DIVIDER_HTML = "<hr style='border: 1px solid #e0e0e0; margin: 20px 0;'>"
+
+_TRACE_TMPL = """
+            <div style="background-color: #fdfefe; padding: 10px; margin-bottom: 8px; border-left: 4px solid #3498db; font-size: 13px;">
+                <span style="color: #2c3e50;"><b>Rule {rule_id}</b> fired.</span><br>
+                <div style="margin-left: 15px; color: #555;">
+                   &bull; Conditions matched: <i>{conditions}</i><br>
+                   &bull; <b>New Fact Added:</b> <span style="background-color: #d6eaf8; padding: 2px 5px; border-radius: 3px;">{conclusion}</span>
+                </div>
+            </div>
+            """
+
+_NEW_FACTS_TMPL = """
+            <div style="margin: 10px 0; padding: 10px; background-color: #fff3cd; border: 1px solid #ffeeba; border-radius: 5px; color: #856404;">
+                <b>🚀 New Facts Discovered:</b> {facts}
+            </div>
+            """
+
+# We show each conclusion card including the "New Facts/Symptoms" that triggered it
+_CARD_TMPL = """
+            <div style="
+                background-color: white; 
+                border: 2px solid #3498db; 
+                border-radius: 12px; 
+                padding: 20px; 
+                margin: 20px 0;
+                box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
+                
+                <h1 style="color: #2c3e50; margin-top: 0; font-size: 24px; border-bottom: 2px solid #ecf0f1; padding-bottom: 15px;">
+                    📋 Final Diagnosis & Reports <span style="color: #2980b9;">🩺 {conclusion}</span>
+                </h1>
+                
+                <div style="background-color: #e8f6f3; border-left: 5px solid #1abc9c; padding: 15px; border-radius: 0 8px 8px 0; margin-top: 15px;">
+                    <h4 style="color: #16a085; margin: 0 0 8px 0;">💊 Treatment & Advice:</h4>
+                    <p style="font-size: 14px; margin: 0; line-height: 1.5; color: #2c3e50;">{precautions}</p>
+                </div>
+            </div>
+            """
+
+# Report fragments for run_verification; status color/label by outcome
+_STATUS_STYLES = {
+    True: ("#27ae60", "CONFIRMED"),
+    False: ("#c0392b", "NOT CONFIRMED"),
+}
+
+_STATUS_TMPL = """
+        <div style="background-color: {color}20; padding: 10px; border-bottom: 2px solid {color};">
+            <h2 style="color: {color}; margin: 0;">Status: {status}</h2>
+        </div>
+        <br>
+        """
+
+# Reset flash: the result area starts on a light tint of the #00bcd4 accent
+# and steps back to white. A few precomputed sheets keep re-polishing to a
+# handful of calls instead of one per animation frame.
+_FADE_FROM = (178, 235, 242)  # #b2ebf2
+_FADE_STEPS = 6
+_FADE_SHEETS = tuple(
+    "QTextEdit {{ background-color: rgb({}, {}, {}); }}".format(
+        *(round(c + (255 - c) * step / (_FADE_STEPS - 1)) for c in _FADE_FROM))
+    for step in range(_FADE_STEPS)
+)
+
+class ModernButton(QPushButton):
+    # Formatted stylesheet per color, shared by every button so Qt is
+    # always handed the same string for the same color
+    _STYLE_CACHE = {}
+    _TEMPLATE = """
             QPushButton {{
                 background-color: {color};
                 color: white;
@@ -34,7 +108,43 @@ class ModernButton(QPushButton):
                 background-color: {color}aa;
                 margin-top: 1px;
             }}
-        """)
+        """
+
+    def __init__(self, text, color="#00bcd4", parent=None):
+        super().__init__(text, parent)
+        self._color = None
+        self.set_color(color)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+
+    def set_color(self, color):
+        # Re-applying the current color would only make Qt re-parse the sheet
+        if color == self._color:
+            return
+        self._color = color
+
+        qss = ModernButton._STYLE_CACHE.get(color)
+        if qss is None:
+            qss = ModernButton._TEMPLATE.format(color=color)
+            ModernButton._STYLE_CACHE[color] = qss
+        self.setStyleSheet(qss)
+
+class LazyComboBox(QComboBox):
+    """QComboBox that asks loader() for its items the first time they are needed."""
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self._loader = loader
+
+    def ensure_populated(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            # Swap in a complete model in one call instead of inserting rows
+            # one by one; the combo's own signals stay quiet meanwhile
+            with QSignalBlocker(self):
+                self.setModel(QStringListModel(list(loader()), self))
+
+    def showPopup(self):
+        self.ensure_populated()
+        super().showPopup()
 
 class AppStyle:
     STYLESHEET = """
@@ -119,11 +229,44 @@ class ArtificialDoctorApp(QMainWindow):
         super().__init__()
         self.setWindowTitle("Expert System - Medical Diagnosis")
         self.resize(1200, 800)
-        self.setStyleSheet(AppStyle.STYLESHEET)
         
-        self.system = ExpertSystem('knowledge_base_15_rules_forward_chaining_15.csv')
+        # Created on first use, see the system property
+        self._system = None
+        # Symptom ids currently checked, kept in sync by _on_symptom_toggled
+        self._selected = set()
+        # Reset fade, created on first use and reused afterwards
+        self.anim = None
+        self._fade_step = None
+        # Checkbox -> symptom id, so the toggle slot needs no Qt lookups
+        self._btn_to_sym = {}
         
         self.init_ui()
+        # Load the knowledge base and build the symptom grid only once the
+        # event loop runs, so the window can paint first
+        QTimer.singleShot(0, self._populate_symptoms)
+
+    @property
+    def system(self):
+        """Rule engine, started on first use (PyPy when available, in-process otherwise)."""
+        if self._system is None:
+            from engine_server import connect_engine
+            self._system = connect_engine(DEFAULT_KB_PATH)
+        return self._system
+
+    # Fetched from the engine once; with the PyPy engine every call is a
+    # round-trip to another process
+    @cached_property
+    def _obs_symptoms(self):
+        return tuple(self.system.get_observable_symptoms())
+
+    @cached_property
+    def _all_conclusions(self):
+        return tuple(self.system.get_all_conclusions())
+
+    @cached_property
+    def _pretty(self):
+        """Display name per observable symptom id, e.g. 'skin_rash' -> 'Skin Rash'."""
+        return {sym: sym.replace("_", " ").title() for sym in self._obs_symptoms}
         
     def init_ui(self):
         main_widget = QWidget()
@@ -160,26 +303,21 @@ class ArtificialDoctorApp(QMainWindow):
         scroll.setFrameShape(QFrame.Shape.NoFrame)
         scroll_content = QWidget()
         scroll_content.setStyleSheet("background-color: transparent;")
+        self._symptoms_content = scroll_content
         self.symptoms_grid = QGridLayout(scroll_content)
         self.symptom_checkboxes = {}
 
-        symptoms = self.system.get_observable_symptoms()
-        
-        row, col = 0, 0
-
-        for sym in symptoms:
-            cb = QCheckBox(sym.replace("_", " ").title())
-            cb.setProperty("symptom_id", sym)
-            cb.stateChanged.connect(self.update_reset_button_state)
-            self.symptom_checkboxes[sym] = cb
-            self.symptoms_grid.addWidget(cb, row, col)
-            row += 1
+        # One non-exclusive group routes every checkbox toggle to a single
+        # slot. All slots run on the GUI thread, so connections are direct.
+        self._btn_group = QButtonGroup(self)
+        self._btn_group.setExclusive(False)
+        self._btn_group.buttonToggled.connect(self._on_symptom_toggled, Qt.ConnectionType.DirectConnection)
             
         scroll.setWidget(scroll_content)
         symptoms_layout.addWidget(scroll)
         
         self.btn_reset = ModernButton("Reset Choices", "#bdc3c7")
-        self.btn_reset.clicked.connect(self.reset_choices)
+        self.btn_reset.clicked.connect(self.reset_choices, Qt.ConnectionType.DirectConnection)
         symptoms_layout.addWidget(self.btn_reset)
         
         # Right Panel
@@ -193,7 +331,7 @@ class ArtificialDoctorApp(QMainWindow):
         fwd_label = QLabel("Diagnosis (Forward Chaining)")
         fwd_label.setStyleSheet("font-weight: bold; color: #16a085; font-size: 16px;")
         btn_diagnose = ModernButton("Diagnose All Possibilities", "#1abc9c")
-        btn_diagnose.clicked.connect(self.run_diagnosis)
+        btn_diagnose.clicked.connect(self.run_diagnosis, Qt.ConnectionType.DirectConnection)
         
         fwd_layout.addWidget(fwd_label)
         fwd_layout.addWidget(btn_diagnose)
@@ -209,11 +347,12 @@ class ArtificialDoctorApp(QMainWindow):
         bwd_label.setStyleSheet("font-weight: bold; color: #2980b9; font-size: 16px;")
         
         input_container = QHBoxLayout()
-        self.disease_combo = QComboBox()
-        self.disease_combo.addItems(self.system.get_all_conclusions())
+        # Filled from the knowledge base the first time it is opened or used
+        self.disease_combo = LazyComboBox(lambda: self._all_conclusions)
+        self.disease_combo.setPlaceholderText("Select a disease...")
         
         btn_verify = ModernButton("Verify Hypothesis", "#3498db")
-        btn_verify.clicked.connect(self.run_verification)
+        btn_verify.clicked.connect(self.run_verification, Qt.ConnectionType.DirectConnection)
         
         input_container.addWidget(self.disease_combo)
         
@@ -239,21 +378,72 @@ class ArtificialDoctorApp(QMainWindow):
         
         main_layout.addWidget(content_splitter)
 
+    def _populate_symptoms(self):
+        symptoms = self._obs_symptoms
+
+        # Fill the grid with layout and painting suspended so Qt does a
+        # single layout pass once every checkbox is in place
+        self._symptoms_content.setUpdatesEnabled(False)
+        self.symptoms_grid.setEnabled(False)
+
+        for idx, sym in enumerate(symptoms):
+            cb = QCheckBox(self._pretty[sym])
+            self._btn_group.addButton(cb)
+            self._btn_to_sym[cb] = sym
+            self.symptom_checkboxes[sym] = cb
+            # Two columns, filled row by row
+            self.symptoms_grid.addWidget(cb, idx // 2, idx % 2)
+
+        self.symptoms_grid.setEnabled(True)
+        self.symptoms_grid.activate()
+        self._symptoms_content.setUpdatesEnabled(True)
+
     def update_reset_button_state(self):
-        any_checked = any(cb.isChecked() for cb in self.symptom_checkboxes.values())
-        if any_checked:
+        if self._selected:
             self.btn_reset.set_color("#3498db")
         else:
             self.btn_reset.set_color("#bdc3c7")
 
     def reset_choices(self):
-        for cb in self.symptom_checkboxes.values():
-            cb.setChecked(False)
+        # Nothing checked and nothing shown: skip the reset and its animation
+        if not self._selected and self.result_area.document().isEmpty():
+            return
+
+        # Uncheck silently and update the selection and reset button once,
+        # instead of running the toggle slot for every checkbox
+        with QSignalBlocker(self._btn_group):
+            for sym in self._selected:
+                self.symptom_checkboxes[sym].setChecked(False)
+        self._selected.clear()
+        self.update_reset_button_state()
         self.result_area.clear()
         self.animate_reset()
 
+    def _on_symptom_toggled(self, btn, checked):
+        sym = self._btn_to_sym[btn]
+        had_selection = bool(self._selected)
+        if checked:
+            self._selected.add(sym)
+        else:
+            self._selected.discard(sym)
+        # The reset button only changes look when the selection becomes
+        # empty or stops being empty
+        if bool(self._selected) != had_selection:
+            self.update_reset_button_state()
+
     def get_selected_symptoms(self):
-        return [sym for sym, cb in self.symptom_checkboxes.items() if cb.isChecked()]
+        # Same (alphabetical) order as the checkbox list
+        return sorted(self._selected)
+
+    def _show_report(self, parts):
+        """Replace the result area with the given HTML fragments in one write."""
+        # Suspend painting so the document rebuild costs a single repaint
+        self.result_area.setUpdatesEnabled(False)
+        try:
+            self.result_area.setHtml("<br>".join(parts))
+        finally:
+            self.result_area.setUpdatesEnabled(True)
+            self.result_area.viewport().update()
 
     def run_diagnosis(self):
         selected = self.get_selected_symptoms()
@@ -261,105 +451,71 @@ class ArtificialDoctorApp(QMainWindow):
             self.show_error("Please select at least one symptom from the list.")
             return
             
-        self.result_area.clear()
-        self.result_area.append("=== RUNNING FORWARD CHAINING DIAGNOSIS ===\n")
-        self.result_area.append(f"Observed Facts: {', '.join(selected).replace('_', ' ')}\n")
+        # Collect the whole report and hand it to the document in one write
+        parts = []
+        parts.append("=== RUNNING FORWARD CHAINING DIAGNOSIS ===<br>")
+        parts.append(f"Observed Facts: {', '.join(self._pretty[sym] for sym in selected)}<br>")
         
         fired_rules, known_facts = self.system.forward_chaining(selected)
         
         if not fired_rules:
-            no_result_html = """
-            <div style="background-color: #ffebee; border: 1px solid #ef9a9a; padding: 15px; border-radius: 8px;">
-                <h3 style="color: #c62828; margin-top: 0;">❌ No Diagnosis Found</h3>
-                <p>No specific disease matched your symptoms based on our current knowledge base.</p>
-                <p><b>Advice:</b> Please consult a real doctor for a professional assessment.</p>
-            </div>
-            """
-            self.result_area.insertHtml(no_result_html)
+            parts.append(_NO_RESULT_HTML)
+            self._show_report(parts)
             return
 
-        # 1. Show Detailed Trace (Smaller, less emphasized)
-        self.result_area.append("<h3 style='color: #7f8c8d; border-bottom: 1px solid #ccc; padding-bottom:5px;'>Diagnostic Trace</h3>")
-        
+        # Single pass over the fired rules: each one contributes a trace
+        # entry, a new fact and a report card, assembled in order below
+        trace_parts = []
         new_facts_list = []
+        card_parts = []
         for rule in fired_rules:
             new_facts_list.append(rule.conclusion)
-            trace_html = f"""
-            <div style="background-color: #fdfefe; padding: 10px; margin-bottom: 8px; border-left: 4px solid #3498db; font-size: 13px;">
-                <span style="color: #2c3e50;"><b>Rule {rule.rule_id}</b> fired.</span><br>
-                <div style="margin-left: 15px; color: #555;">
-                   &bull; Conditions matched: <i>{', '.join(rule.conditions)}</i><br>
-                   &bull; <b>New Fact Added:</b> <span style="background-color: #d6eaf8; padding: 2px 5px; border-radius: 3px;">{rule.conclusion}</span>
-                </div>
-            </div>
-            """
-            self.result_area.insertHtml(trace_html)
+            trace_parts.append(_TRACE_TMPL.format(
+                rule_id=rule.rule_id,
+                # Derived facts (e.g. 'emergency') have no display name
+                conditions=', '.join(self._pretty.get(c, c) for c in rule.conditions),
+                conclusion=rule.conclusion
+            ))
+            card_parts.append(_CARD_TMPL.format(conclusion=rule.conclusion, precautions=rule.precautions))
+            card_parts.append("")  # Spacing
+
+        # 1. Show Detailed Trace (Smaller, less emphasized)
+        parts.append(_TRACE_HEADING_HTML)
+        parts.extend(trace_parts)
 
         # New Facts Summary
         if new_facts_list:
-            facts_html = f"""
-            <div style="margin: 10px 0; padding: 10px; background-color: #fff3cd; border: 1px solid #ffeeba; border-radius: 5px; color: #856404;">
-                <b>🚀 New Facts Discovered:</b> {', '.join(new_facts_list)}
-            </div>
-            """
-            self.result_area.insertHtml(facts_html)
+            parts.append(_NEW_FACTS_TMPL.format(facts=', '.join(new_facts_list)))
 
-        self.result_area.append("<hr style='border: 1px solid #e0e0e0; margin: 20px 0;'>")
+        parts.append(_DIVIDER_HTML)
 
         # 2. Show Final Results (Special, emphasized)
-        # self.result_area.append("<h2 style='color: #2c3e50; text-align: center;'>📋 Final Diagnosis & Reports</h2>")
-        
-        for rule in fired_rules:
-            # We show each conclusion card including the "New Facts/Symptoms" that triggered it
-            card_html = f"""
-            <div style="
-                background-color: white; 
-                border: 2px solid #3498db; 
-                border-radius: 12px; 
-                padding: 20px; 
-                margin: 20px 0;
-                box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
-                
-                <h1 style="color: #2c3e50; margin-top: 0; font-size: 24px; border-bottom: 2px solid #ecf0f1; padding-bottom: 15px;">
-                    📋 Final Diagnosis & Reports <span style="color: #2980b9;">🩺 {rule.conclusion}</span>
-                </h1>
-                
-                <div style="background-color: #e8f6f3; border-left: 5px solid #1abc9c; padding: 15px; border-radius: 0 8px 8px 0; margin-top: 15px;">
-                    <h4 style="color: #16a085; margin: 0 0 8px 0;">💊 Treatment & Advice:</h4>
-                    <p style="font-size: 14px; margin: 0; line-height: 1.5; color: #2c3e50;">{rule.precautions}</p>
-                </div>
-            </div>
-            """
-            self.result_area.insertHtml(card_html)
-            self.result_area.append("")  # Spacing
+        # parts.append("<h2 style='color: #2c3e50; text-align: center;'>📋 Final Diagnosis & Reports</h2>")
+        parts.extend(card_parts)
+
+        self._show_report(parts)
 
     def run_verification(self):
         selected = self.get_selected_symptoms()
+        self.disease_combo.ensure_populated()
         target = self.disease_combo.currentText()
         
         if not selected:
              self.show_error("Please select symptoms first to verify them against the disease.")
              return
              
-        self.result_area.clear()
-        self.result_area.append(f"=== VERIFYING HYPOTHESIS: {target.upper()} ===\n")
+        # Collect the whole report and hand it to the document in one write
+        parts = []
+        parts.append(f"=== VERIFYING HYPOTHESIS: {target.upper()} ===<br>")
         
         success, trace = self.system.backward_verification(target, selected)
         
-        color = "#27ae60" if success else "#c0392b"
-        status = "CONFIRMED" if success else "NOT CONFIRMED"
-        
-        header_html = f"""
-        <div style="background-color: {color}20; padding: 10px; border-bottom: 2px solid {color};">
-            <h2 style="color: {color}; margin: 0;">Status: {status}</h2>
-        </div>
-        <br>
-        """
-        self.result_area.insertHtml(header_html)
+        color, status = _STATUS_STYLES[bool(success)]
+        parts.append(_STATUS_TMPL.format(color=color, status=status))
         
-        self.result_area.append("<b>Logic Trace:</b>")
-        for line in trace:
-            self.result_area.insertHtml(line + "<br>")
+        parts.append("<b>Logic Trace:</b>")
+        parts.extend(trace)
+        self._show_report(parts)
 
     def show_error(self, message):
         msg = QMessageBox(self)
@@ -370,23 +526,38 @@ class ArtificialDoctorApp(QMainWindow):
         msg.exec()
 
     def animate_reset(self):
-        self.effect = QGraphicsOpacityEffect(self.centralWidget())
-        self.centralWidget().setGraphicsEffect(self.effect)
-        
-        self.anim = QPropertyAnimation(self.effect, b"opacity")
-        self.anim.setDuration(400)
-        self.anim.setStartValue(0.5)
-        self.anim.setEndValue(1.0)
-        self.anim.setEasingCurve(QEasingCurve.Type.OutQuad)
-        
-        # Cleanup effect after animation to prevent rendering artifacts
-        self.anim.finished.connect(lambda: self.centralWidget().setGraphicsEffect(None))
-        
+        if self.anim is None:
+            # Steps the report background through _FADE_SHEETS; unlike a
+            # QGraphicsOpacityEffect this needs no offscreen pixmap
+            self.anim = QVariantAnimation(self)
+            self.anim.setDuration(400)
+            self.anim.setStartValue(0)
+            self.anim.setEndValue(_FADE_STEPS - 1)
+            self.anim.setEasingCurve(QEasingCurve.Type.OutQuad)
+            self.anim.valueChanged.connect(self._on_fade_step, Qt.ConnectionType.DirectConnection)
+            self.anim.finished.connect(self._end_fade, Qt.ConnectionType.DirectConnection)
+
+        self.anim.stop()
         self.anim.start()
 
+    def _on_fade_step(self, step):
+        # Most frames land on the step already shown
+        if step != self._fade_step:
+            self._fade_step = step
+            self.result_area.setStyleSheet(_FADE_SHEETS[step])
+
+    def _end_fade(self):
+        # Hand the widget back to the application stylesheet
+        self._fade_step = None
+        self.result_area.setStyleSheet("")
+
 if __name__ == "__main__":
+    # Must be set before the QApplication exists
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_DontCreateNativeWidgetSiblings)
     app = QApplication(sys.argv)
     app.setStyle("Fusion") 
+    # Applied once application-wide so Qt parses the sheet a single time
+    app.setStyleSheet(AppStyle.STYLESHEET)
     
     palette = QPalette()
     palette.setColor(QPalette.ColorRole.Window, QColor(240, 244, 248))
@@ -0,0 +1,27 @@
+"""
+Qt binding shim for the desktop UI.
+
+PyQt5 is preferred: its per-signal and per-call binding overhead is lower
+than PyQt6's, which matters for a UI that fires a signal on every symptom
+toggle. PyQt6 is used when PyQt5 is not installed. Only the names the UI
+imports are re-exported; both bindings accept the scoped enum spelling
+(e.g. Qt.ConnectionType.DirectConnection) used throughout.
+"""
+try:
+    from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                                 QLabel, QGroupBox, QCheckBox, QPushButton, QTextEdit,
+                                 QComboBox, QScrollArea, QFrame, QSplitter, QMessageBox,
+                                 QGridLayout, QButtonGroup)
+    from PyQt5.QtCore import (Qt, QVariantAnimation, QEasingCurve, QTimer, QSignalBlocker,
+                              QStringListModel)
+    from PyQt5.QtGui import QPalette, QColor
+    QT_BINDING = 'PyQt5'
+except ImportError:
+    from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                                 QLabel, QGroupBox, QCheckBox, QPushButton, QTextEdit,
+                                 QComboBox, QScrollArea, QFrame, QSplitter, QMessageBox,
+                                 QGridLayout, QButtonGroup)
+    from PyQt6.QtCore import (Qt, QVariantAnimation, QEasingCurve, QTimer, QSignalBlocker,
+                              QStringListModel)
+    from PyQt6.QtGui import QPalette, QColor
+    QT_BINDING = 'PyQt6'
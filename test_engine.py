@@ -0,0 +1,319 @@
+"""
+Parity tests for engine.py: forward chaining (generated matcher and numba
+kernel) and backward verification must behave exactly like the original
+straightforward implementation, reproduced below as the reference.
+
+Run with: python -m unittest test_engine
+"""
+import csv
+import importlib.util
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from engine import (ExpertSystem, DEFAULT_KB_PATH, INDEX_CACHE_SUFFIX, INDEX_CACHE_VERSION,
+                    index_cache_path)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HAS_NUMBA = importlib.util.find_spec('numba') is not None
+
+
+def reference_forward_chaining(rules, selected_symptoms):
+    known_facts = set(selected_symptoms)
+    fired_rules = []
+
+    while True:
+        new_rule_fired = False
+        for rule in rules:
+            if rule in fired_rules:
+                continue
+
+            if all(c in known_facts for c in rule.conditions):
+                if rule.conclusion not in known_facts:
+                    known_facts.add(rule.conclusion)
+                    new_rule_fired = True
+                fired_rules.append(rule)
+
+        if not new_rule_fired:
+            break
+
+    return fired_rules, known_facts
+
+
+def reference_backward_verification(rules, target_disease, user_symptoms):
+    """The original recursive verification; only valid for acyclic rule bases."""
+    known_facts = set(user_symptoms)
+    trace_log = []
+
+    def check_goal(goal, depth=0):
+        indent = "&nbsp;" * (depth * 4)
+
+        if goal in known_facts:
+            trace_log.append(f"{indent}<span style='color:green'>[OK] Fact '{goal}' detected.</span>")
+            return True
+
+        candidate_rules = [r for r in rules if r.conclusion == goal]
+
+        if not candidate_rules:
+            trace_log.append(f"{indent}<span style='color:red'>[MISSING] '{goal}' not found in symptoms.</span>")
+            return False
+
+        for rule in candidate_rules:
+            trace_log.append(f"{indent}Checking Rule {rule.rule_id} for '{goal}'...")
+
+            all_conditions_met = True
+            for condition in rule.conditions:
+                if not check_goal(condition, depth + 1):
+                    all_conditions_met = False
+                    break
+
+            if all_conditions_met:
+                trace_log.append(f"{indent}<span style='color:blue'>[SUCCESS] Rule {rule.rule_id} fired. '{goal}' confirmed.</span>")
+                known_facts.add(goal)
+                return True
+
+        trace_log.append(f"{indent}<span style='color:orange'>[FAIL] Could not establish '{goal}'.</span>")
+        return False
+
+    result = check_goal(target_disease)
+    return result, trace_log
+
+
+def write_kb(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rule_id', 'conditions', 'conclusion', 'precautions'])
+        for rule_id, conditions, conclusion in rows:
+            writer.writerow([rule_id, ';'.join(conditions), conclusion, 'rest'])
+
+
+def random_acyclic_rows(rng, n_terms, n_rules):
+    """Rules only conclude terms ranked above all their conditions."""
+    terms = [f"t{i}" for i in range(n_terms)]
+    rows = []
+    for r in range(n_rules):
+        cut = rng.randint(1, n_terms - 1)
+        conditions = rng.sample(terms[:cut], rng.randint(1, min(cut, 4)))
+        rows.append((f"R{r}", conditions, terms[rng.randint(cut, n_terms - 1)]))
+    return terms, rows
+
+
+def rule_ids(rules):
+    return [r.rule_id for r in rules]
+
+
+class EngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # Keep index caches out of the real per-user cache directory
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        patcher = mock.patch('engine.INDEX_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self, rows, name='kb.csv'):
+        path = os.path.join(self.tmp_dir, name)
+        write_kb(path, rows)
+        return ExpertSystem(path)
+
+    def assert_forward_parity(self, system, selected, stop=None):
+        expected_rules, expected_facts = reference_forward_chaining(system.rules, selected)
+        if stop is None:
+            fired_rules, known_facts = system.forward_chaining(selected)
+        else:
+            fired_rules, known_facts = system.forward_chaining(selected, stop)
+        self.assertEqual(rule_ids(fired_rules), rule_ids(expected_rules), selected)
+        self.assertEqual(known_facts, expected_facts, selected)
+
+    def assert_backward_parity(self, system, goal, selected):
+        expected = reference_backward_verification(system.rules, goal, selected)
+        self.assertEqual(system.backward_verification(goal, selected), expected, (goal, selected))
+
+
+class BundledKnowledgeBaseTest(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+        path = os.path.join(self.tmp_dir, 'kb.csv')
+        shutil.copy(os.path.join(HERE, DEFAULT_KB_PATH), path)
+        self.system = ExpertSystem(path)
+        self.symptoms = self.system.get_observable_symptoms()
+
+    def test_listings(self):
+        rules = self.system.rules
+        conclusions = {r.conclusion for r in rules}
+        conditions = {c for r in rules for c in r.conditions}
+        self.assertEqual(len(rules), 15)
+        self.assertEqual(self.symptoms, sorted(conditions - conclusions))
+        self.assertEqual(self.system.get_all_conclusions(), sorted(conclusions))
+
+    def test_fired_rules_keep_rule_list_order(self):
+        fired_rules, _ = self.system.forward_chaining(
+            ['cough', 'chest_pain', 'rusty_sputum', 'breathlessness',
+             'headache', 'stiff_neck', 'blurred_and_distorted_vision'])
+        self.assertEqual(rule_ids(fired_rules), ['R06', 'R09'])
+
+        fired_rules, _ = self.system.forward_chaining(['emergency', 'Heart attack'])
+        self.assertEqual(rule_ids(fired_rules), ['R07', 'R08'])
+
+    def test_chained_conclusions_fire_in_later_passes(self):
+        fired_rules, known_facts = self.system.forward_chaining(
+            ['chest_pain', 'breathlessness', 'sweating'])
+        self.assertEqual(rule_ids(fired_rules), ['R14', 'R08', 'R07'])
+        self.assertIn('seek_emergency_care', known_facts)
+
+    def test_forward_chaining_parity(self):
+        rng = random.Random(0)
+        self.assert_forward_parity(self.system, [])
+        self.assert_forward_parity(self.system, self.symptoms)
+        for _ in range(300):
+            selected = rng.sample(self.symptoms, rng.randint(1, 12))
+            self.assert_forward_parity(self.system, selected)
+            self.assert_forward_parity(self.system, selected, stop=lambda facts: False)
+
+    def test_backward_verification_parity(self):
+        rng = random.Random(1)
+        for goal in self.system.get_all_conclusions():
+            self.assert_backward_parity(self.system, goal, [])
+            for _ in range(20):
+                self.assert_backward_parity(self.system, goal, rng.sample(self.symptoms, rng.randint(1, 12)))
+
+
+class RandomKnowledgeBaseTest(EngineTestCase):
+    def test_forward_and_backward_parity(self):
+        rng = random.Random(2)
+        for trial in range(40):
+            terms, rows = random_acyclic_rows(rng, rng.randint(5, 40), rng.randint(1, 40))
+            system = self.load(rows, f'kb{trial}.csv')
+            for _ in range(20):
+                selected = rng.sample(terms, rng.randint(0, len(terms)))
+                self.assert_forward_parity(system, selected)
+                for goal in rng.sample(terms, min(4, len(terms))):
+                    self.assert_backward_parity(system, goal, selected)
+
+    def test_stop_ends_chaining_early(self):
+        system = self.load([('R1', ['a'], 'b'), ('R2', ['b'], 'c'), ('R3', ['c'], 'd')])
+        fired_rules, known_facts = system.forward_chaining(['a'], stop=lambda facts: 'c' in facts)
+        self.assertEqual(rule_ids(fired_rules), ['R1', 'R2'])
+        self.assertEqual(known_facts, {'a', 'b', 'c'})
+
+    def test_unknown_symptoms_are_kept(self):
+        system = self.load([('R1', ['a'], 'b')])
+        _, known_facts = system.forward_chaining(['a', 'not_in_rules'])
+        self.assertEqual(known_facts, {'a', 'b', 'not_in_rules'})
+
+    def test_rows_without_conditions_are_skipped(self):
+        system = self.load([('R1', ['a'], 'b'), ('R2', [''], 'y'), ('R3', [' ', ' '], 'z')])
+        self.assertEqual(rule_ids(system.rules), ['R1'])
+        self.assertEqual(system.forward_chaining([]), ([], set()))
+        self.assertEqual(system.get_observable_symptoms(), ['a'])
+
+    @unittest.skipUnless(HAS_NUMBA, "numba is not installed")
+    def test_kernel_parity(self):
+        rng = random.Random(3)
+        # Up to four uint64 lanes of terms
+        for trial in range(12):
+            terms, rows = random_acyclic_rows(rng, rng.randint(5, 250), rng.randint(1, 400))
+            system = self.load(rows, f'kb{trial}.csv')
+            # Forced on regardless of KERNEL_MIN_RULES
+            system._init_kernel()
+            self.assertIsNotNone(system._fc_kernel)
+            for _ in range(30):
+                self.assert_forward_parity(system, rng.sample(terms, rng.randint(0, min(30, len(terms)))))
+
+
+class CyclicKnowledgeBaseTest(EngineTestCase):
+    ROWS = [
+        ('R1', ['a', 'b'], 'c'),
+        ('R2', ['c'], 'a'),
+        ('R3', ['d'], 'a'),
+        ('R4', ['a'], 'e'),
+        ('R5', ['e'], 'c'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.system = self.load(self.ROWS)
+
+    def test_forward_chaining_terminates(self):
+        self.assert_forward_parity(self.system, ['d', 'b'])
+        self.assert_forward_parity(self.system, ['c'])
+
+    def test_loop_is_cut_and_other_rules_still_tried(self):
+        success, trace = self.system.backward_verification('c', ['d', 'b'])
+        self.assertTrue(success)
+        self.assertTrue(any("[LOOP] 'c' depends on itself" in line for line in trace))
+        self.assertTrue(any("Rule R3 fired. 'a' confirmed" in line for line in trace))
+
+    def test_unprovable_cycle_fails(self):
+        success, trace = self.system.backward_verification('c', [])
+        self.assertFalse(success)
+        self.assertTrue(any('[LOOP]' in line for line in trace))
+        self.assertIn("[FAIL] Could not establish 'c'.", trace[-1])
+
+
+class IndexCacheTest(EngineTestCase):
+    ROWS = [('R1', ['a', 'b'], 'c'), ('R2', ['c'], 'd')]
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp_dir, 'kb.csv')
+        self.cache_path = index_cache_path(self.path)
+        write_kb(self.path, self.ROWS)
+
+    def assert_loaded(self, system, rows):
+        self.assertEqual([(r.rule_id, r.conditions, r.conclusion) for r in system.rules],
+                         [(rule_id, conditions, conclusion) for rule_id, conditions, conclusion in rows])
+        self.assert_forward_parity(system, ['a', 'b'])
+
+    def plant_cache(self, path):
+        """Write a cache with a matching signature that would load no rules."""
+        stat = os.stat(self.path)
+        signature = (INDEX_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+        with open(path, 'wb') as f:
+            pickle.dump((signature, {'rules': []}), f)
+
+    def test_cache_is_written_and_reused(self):
+        self.assert_loaded(ExpertSystem(self.path), self.ROWS)
+        self.assertTrue(os.path.exists(self.cache_path))
+        self.assert_loaded(ExpertSystem(self.path), self.ROWS)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['cache', 'kb.csv'])
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(self.cache_path)])
+
+    def test_cache_next_to_knowledge_base_is_ignored(self):
+        self.plant_cache(self.path + INDEX_CACHE_SUFFIX)
+        self.assert_loaded(ExpertSystem(self.path), self.ROWS)
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), "ownership checks are POSIX only")
+    def test_cache_writable_by_others_is_ignored(self):
+        ExpertSystem(self.path)
+        self.plant_cache(self.cache_path)
+        os.chmod(self.cache_path, 0o666)
+        self.assert_loaded(ExpertSystem(self.path), self.ROWS)
+
+    def test_stale_cache_is_rebuilt(self):
+        ExpertSystem(self.path)
+        rows = self.ROWS + [('R3', ['d'], 'e')]
+        write_kb(self.path, rows)
+        stat = os.stat(self.path)
+        # Guarantee a different signature even on coarse-mtime filesystems
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assert_loaded(ExpertSystem(self.path), rows)
+
+    def test_corrupt_cache_is_rebuilt(self):
+        ExpertSystem(self.path)
+        with open(self.cache_path, 'wb') as f:
+            f.write(b'not a pickle')
+        self.assert_loaded(ExpertSystem(self.path), self.ROWS)
+        # The rebuilt cache replaces the corrupt one
+        self.assert_loaded(ExpertSystem(self.path), self.ROWS)
+
+
+if __name__ == '__main__':
+    unittest.main()